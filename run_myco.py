@@ -10,118 +10,194 @@ This script automates the process of running the Myco latency testing setup:
 
 Usage:
     python3 run_myco.py
+
+Requires Python 3.10+ on Linux.
 """
 
+import glob
+import re
+import selectors
+import shutil
+import socket
 import subprocess
 import time
 import signal
 import sys
 import os
-from typing import List, Optional
+from dataclasses import dataclass, field
+
+# Command line argument naming one of the rpc_server1/rpc_server2 binaries (or their _tput
+# variants): the executable itself, a path ending in it, or cargo's --bin value in either form
+RPC_SERVER_ARG = re.compile(rb"(?:--bin=|.*/)?rpc_server[12](?:_tput)?")
+
+@dataclass
+class _Server:
+    """A launched server being watched for its readiness message or an early exit"""
+    name: str
+    process: subprocess.Popen
+    needle: bytes  # Encoded readiness message
+    timeout: int
+    deadline: float  # time.monotonic() value at which the server is given up on
+    pidfd: int | None  # None where pidfd_open is unavailable; the process is polled instead
+    buf: bytearray = field(default_factory=bytearray)  # Output not yet printed
+    scanned: int = 0  # Length of buf already searched for the needle
 
 class MycoRunner:
-    "Class to manage Myco client-server setup and execution"
-    def __init__(self):
-        self.processes: List[subprocess.Popen] = []
-        self.server2_process: Optional[subprocess.Popen] = None
-        self.server1_process: Optional[subprocess.Popen] = None
-        
-    def cleanup_ports(self):
-        """Kill any processes using the Myco ports - enhanced version"""
-        ports = [3002, 3004]
-        killed_any = False
+    """Class to manage Myco client-server setup and execution
+
+    Don't pass preexec_fn, user, group or extra_groups to Popen here; they force a full fork().
+    """
+    def __init__(self, just: str):
+        self._just = just  # Resolved path to the just binary, looked up once in main()
+        self.processes: list[subprocess.Popen] = []
         
-        for port in ports:
+    @staticmethod
+    def _open_pidfd(process: subprocess.Popen) -> int | None:
+        """Open a pidfd for a child process, or None if the platform lacks pidfd support"""
+        try:
+            return os.pidfd_open(process.pid, 0)
+        except (AttributeError, OSError):
+            # os.pidfd_open needs Python 3.9+ and Linux 5.3+; fall back to polling
+            return None
+
+    def _wait_for_exit(self, process: subprocess.Popen, timeout: float) -> bool:
+        """Wait up to timeout seconds for a process to exit, returning True if it did"""
+        pidfd = self._open_pidfd(process)
+        if pidfd is None:
             try:
-                # Method 1: Use lsof to find processes using the port
-                result = subprocess.run(
-                    ["lsof", "-ti", f":{port}"], 
-                    capture_output=True, 
-                    text=True,
-                    check=False
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    pids = result.stdout.strip().split('\n')
-                    for pid in pids:
-                        if pid.strip():
-                            print(f"   Killing process {pid} using port {port}")
-                            subprocess.run(["kill", "-9", pid.strip()], capture_output=True, check=False)
-                            killed_any = True
-                            time.sleep(0.1)  # Brief pause between kills
-                            
-                # Method 2: Also try netstat approach as backup
-                try:
-                    result = subprocess.run(
-                        ["netstat", "-tulpn"], 
-                        capture_output=True, 
-                        text=True,
-                        check=False
-                    )
-                    if result.returncode == 0:
-                        for line in result.stdout.split('\n'):
-                            if f":{port}" in line and "LISTEN" in line:
-                                # Extract PID from netstat output (format varies)
-                                parts = line.split()
-                                for part in parts:
-                                    if '/' in part:
-                                        pid = part.split('/')[0]
-                                        if pid.isdigit():
-                                            print(f"   Killing process {pid} listening on port {port}")
-                                            subprocess.run(["kill", "-9", pid], capture_output=True, check=False)
-                                            killed_any = True
-                except (OSError, subprocess.SubprocessError):
-                    pass
-                    
-            except (OSError, subprocess.SubprocessError):
-                # lsof might not be available or other issues
-                pass
+                process.wait(timeout=timeout)
+                return True
+            except subprocess.TimeoutExpired:
+                return False
         
-        # Method 3: Kill any rpc_server processes regardless
         try:
-            result = subprocess.run(["pgrep", "-f", "rpc_server"], capture_output=True, text=True, check=False)
-            if result.returncode == 0 and result.stdout.strip():
-                pids = result.stdout.strip().split('\n')
-                for pid in pids:
-                    if pid.strip():
-                        print(f"   Killing rpc_server process {pid}")
-                        subprocess.run(["kill", "-9", pid.strip()], capture_output=True, check=False)
-                        killed_any = True
-        except (OSError, subprocess.SubprocessError):
-            pass
+            # The pidfd becomes readable once the child exits
+            with selectors.DefaultSelector() as sel:
+                sel.register(pidfd, selectors.EVENT_READ)
+                if not sel.select(timeout=timeout):
+                    return False
+            process.wait()  # Already exited, so this only reaps it
+            return True
+        finally:
+            os.close(pidfd)
+
+    @staticmethod
+    def _read_socket_inodes() -> dict[int, int]:
+        """Map TCP socket inodes to their local ports using /proc/net/tcp and /proc/net/tcp6"""
+        inode_ports: dict[int, int] = {}
+        for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+            try:
+                with open(table, encoding="ascii") as f:
+                    next(f, None)  # Skip the header row
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) < 10:
+                            continue
+                        inode = int(fields[9])
+                        if inode:  # Sockets without an owner (e.g. TIME_WAIT) report inode 0
+                            inode_ports[inode] = int(fields[1].split(':')[1], 16)
+            except (OSError, ValueError):
+                pass
+        return inode_ports
+
+    @staticmethod
+    def _discover_targets(ports: list[int], cmdline_patterns: list[re.Pattern]) -> dict[int, str]:
+        """Find processes holding a socket on one of the ports or running a matching command, in one /proc walk
+
+        Each pattern must match a whole command line argument, not a substring of
+        one. Returns a description of each pid for logging.
+        """
+        wanted = {
+            f"socket:[{inode}]": port
+            for inode, port in MycoRunner._read_socket_inodes().items()
+            if port in ports
+        }
+        targets: dict[int, str] = {}
+        own_pid = os.getpid()
+        for proc_dir in glob.glob("/proc/[0-9]*"):
+            pid = int(proc_dir[len("/proc/"):])
+            if pid == own_pid:
+                continue
             
-        # Method 4: Also kill any cargo processes that might be running our servers
+            try:
+                with open(f"{proc_dir}/cmdline", "rb") as f:
+                    cmdline = f.read()
+            except OSError:
+                continue  # Process exited or is not readable
+            args = cmdline.split(b"\0")
+            if any(pattern.fullmatch(arg) for pattern in cmdline_patterns for arg in args):
+                kind = "cargo" if os.path.basename(args[0]) == b"cargo" else "rpc_server"
+                targets[pid] = f"{kind} process {pid}"
+            
+            if not wanted:
+                continue
+            try:
+                fds = os.listdir(f"{proc_dir}/fd")
+            except OSError:
+                continue  # Process exited or belongs to another user
+            for fd in fds:
+                try:
+                    target = os.readlink(f"{proc_dir}/fd/{fd}")
+                except OSError:
+                    continue
+                if target in wanted:
+                    targets[pid] = f"process {pid} using port {wanted[target]}"
+                    break
+        return targets
+
+    @staticmethod
+    def _kill(pid: int) -> bool:
+        """SIGKILL a pid, returning False if it is gone or not ours"""
         try:
-            result = subprocess.run(["pgrep", "-f", "cargo run.*rpc_server"], capture_output=True, text=True, check=False)
-            if result.returncode == 0 and result.stdout.strip():
-                pids = result.stdout.strip().split('\n')
-                for pid in pids:
-                    if pid.strip():
-                        print(f"   Killing cargo process {pid}")
-                        subprocess.run(["kill", "-9", pid.strip()], capture_output=True, check=False)
-                        killed_any = True
-        except (OSError, subprocess.SubprocessError):
-            pass
+            os.kill(pid, signal.SIGKILL)
+            return True
+        except (ProcessLookupError, PermissionError):
+            return False
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        """Check whether a pid is still running; zombies count as gone since their sockets are closed"""
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            return False
+        # The state field follows the parenthesised command name, which may contain spaces
+        return stat[stat.rfind(b")") + 2:][:1] != b"Z"
+
+    def cleanup_ports(self):
+        """Kill any processes using the Myco ports or running rpc_server"""
+        ports = [3002, 3004]
+        targets = self._discover_targets(ports, [RPC_SERVER_ARG])
+        
+        killed = []
+        for pid, description in targets.items():
+            print(f"   Killing {description}")
+            if self._kill(pid):
+                killed.append(pid)
             
-        if killed_any:
+        if killed:
             print("   Waiting for processes to terminate...")
-            time.sleep(2)  # Give time for processes to actually terminate
+            # Give processes up to 2s to actually terminate, returning as soon as they have
+            deadline = time.monotonic() + 2.0
+            while time.monotonic() < deadline:
+                if not any(self._is_alive(pid) for pid in killed):
+                    break
+                time.sleep(0.02)
 
     def check_ports_free(self) -> bool:
         """Check if ports 3002 and 3004 are free"""
         ports = [3002, 3004]
         for port in ports:
-            try:
-                result = subprocess.run(
-                    ["lsof", "-ti", f":{port}"], 
-                    capture_output=True, 
-                    text=True,
-                    check=False
-                )
-                if result.returncode == 0 and result.stdout.strip():
+            # Probe the same wildcard address the servers bind; SO_REUSEADDR mirrors
+            # tokio's listener so only a live socket, not TIME_WAIT, counts as in use
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+                probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                try:
+                    probe.bind(("0.0.0.0", port))
+                except OSError:
                     print(f"⚠️  Port {port} is still in use")
                     return False
-            except (OSError, subprocess.SubprocessError):
-                pass
         return True
 
     def cleanup(self):
@@ -133,25 +209,14 @@ class MycoRunner:
             if process.poll() is None:  # Process is still running
                 print(f"   Terminating process {process.pid}")
                 process.terminate()
-                try:
-                    process.wait(timeout=3)
-                except subprocess.TimeoutExpired:
+                if not self._wait_for_exit(process, timeout=3):
                     print(f"   Force killing process {process.pid}")
                     process.kill()
-                    try:
-                        process.wait(timeout=2)
-                    except subprocess.TimeoutExpired:
-                        pass
+                    self._wait_for_exit(process, timeout=2)
         
-        # Then, kill any remaining processes on our ports
+        # Then, kill any remaining processes on our ports or running rpc_server
         self.cleanup_ports()
         
-        # Also kill any rpc_server processes that might be lingering
-        try:
-            subprocess.run(["pkill", "-f", "rpc_server"], capture_output=True, check=False)
-        except (OSError, subprocess.SubprocessError):
-            pass
-            
         print("✅ Cleanup completed")
 
     def signal_handler(self, signum, _frame):
@@ -160,108 +225,173 @@ class MycoRunner:
         self.cleanup()
         sys.exit(0)
 
-    def wait_for_server_ready(self, server_name: str, expected_output: str, process: subprocess.Popen, timeout: int = 30) -> bool:
-        """Wait for a server to be ready by monitoring its output"""
-        print(f"⏳ Waiting for {server_name} to be ready...")
-        
-        start_time = time.time()
-        output_buffer = ""
-        
-        while time.time() - start_time < timeout:
-            if process.poll() is not None:
-                print(f"❌ {server_name} process terminated unexpectedly")
-                return False
-                
-            # Read available output
-            try:
-                if process.stdout is not None:
-                    line = process.stdout.readline()
-                    if line:
-                        line_str = line.decode('utf-8').strip()
-                        output_buffer += line_str + "\n"
-                        print(f"   {server_name}: {line_str}")
-                        
-                        if expected_output in line_str:
-                            print(f"✅ {server_name} is ready!")
-                            return True
-            except (OSError, UnicodeDecodeError) as e:
-                print(f"   Error reading from {server_name}: {e}")
-                
-            time.sleep(0.1)
-        
-        print(f"❌ {server_name} did not become ready within {timeout} seconds")
-        return False
-
-    def start_server2(self) -> bool:
-        """Start Server2"""
-        print("🚀 Starting Server2...")
+    def _spawn(self, name: str, cmd: list[str]) -> subprocess.Popen | None:
+        """Launch a server with its output piped back to us"""
+        print(f"🚀 Starting {name}...")
         try:
-            cmd = ["just", "server2"]
-            self.server2_process = subprocess.Popen(
+            process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=False,
                 bufsize=0
             )
-            self.processes.append(self.server2_process)
-            
-            # Wait for Server2 to be ready
-            return self.wait_for_server_ready(
-                "Server2", 
-                "Server2 listening on", 
-                self.server2_process
-            )
-            
         except (OSError, subprocess.SubprocessError) as e:
-            print(f"❌ Failed to start Server2: {e}")
-            return False
+            print(f"❌ Failed to start {name}: {e}")
+            return None
+        self.processes.append(process)
+        return process
 
-    def start_server1(self) -> bool:
-        """Start Server1"""
-        print("🚀 Starting Server1...")
+    def start_servers(self, servers: list[tuple[str, list[str], str, int]]) -> bool:
+        """Start servers in order, each once the previous one is ready, watching all of them on one selector.
+
+        Each entry is (name, command, expected_output, timeout); a server's timeout
+        counts from its own launch. Servers that are already up stay watched, so
+        one of them exiting early fails the startup immediately.
+        """
+        launched: list[_Server] = []
         try:
-            cmd = ["just", "server1"]
-            self.server1_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=False,
-                bufsize=0
-            )
-            self.processes.append(self.server1_process)
+            with selectors.DefaultSelector() as sel:
+                for name, cmd, expected_output, timeout in servers:
+                    server = self._launch(sel, name, cmd, expected_output, timeout)
+                    if server is None:
+                        return False
+                    launched.append(server)
+                    if not self._wait_until_ready(sel, server, launched):
+                        return False
+                return True
+        finally:
+            for server in launched:
+                if server.pidfd is not None:
+                    os.close(server.pidfd)
+
+    def _launch(self, sel: selectors.BaseSelector, name: str, cmd: list[str], expected_output: str, timeout: int) -> _Server | None:
+        """Spawn a server and register its output and exit with the selector"""
+        process = self._spawn(name, cmd)
+        if process is None:
+            return None
+        print(f"⏳ Waiting for {name} to be ready...")
+        if process.stdout is None:
+            print(f"❌ {name} has no output pipe to monitor")
+            return None
+        
+        fd = process.stdout.fileno()
+        os.set_blocking(fd, False)
+        server = _Server(
+            name=name,
+            process=process,
+            needle=expected_output.encode(),
+            timeout=timeout,
+            deadline=time.monotonic() + timeout,
+            pidfd=self._open_pidfd(process),
+        )
+        sel.register(fd, selectors.EVENT_READ, server)
+        if server.pidfd is not None:
+            # Deliver process exit as an event alongside its output
+            sel.register(server.pidfd, selectors.EVENT_READ, server)
+        return server
+
+    def _wait_until_ready(self, sel: selectors.BaseSelector, server: _Server, launched: list[_Server]) -> bool:
+        """Wait for a server's readiness message while watching every launched server for an early exit"""
+        while True:
+            remaining = server.deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"❌ {server.name} did not become ready within {server.timeout} seconds")
+                return False
             
-            # Wait for Server1 to be ready
-            return self.wait_for_server_ready(
-                "Server1", 
-                "Server1 listening on", 
-                self.server1_process,
-                timeout=60  # Server1 needs more time to establish connections
-            )
+            # Block until output or exit is available instead of sleeping between reads
+            events = sel.select(timeout=min(remaining, 0.5))
             
-        except (OSError, subprocess.SubprocessError) as e:
-            print(f"❌ Failed to start Server1: {e}")
+            # Handle output before exits so a final readiness line is not missed
+            for key, _mask in events:
+                if key.fd != key.data.pidfd and self._read_output(sel, key):
+                    return True
+            
+            exited = [key.data for key, _mask in events if key.fd == key.data.pidfd]
+            exited += [s for s in launched if s.pidfd is None and s.process.poll() is not None]
+            if exited:
+                self._report_exit(exited[0])
+                return False
+
+    @staticmethod
+    def _read_output(sel: selectors.BaseSelector, key: selectors.SelectorKey) -> bool:
+        """Print a server's new output, returning True once its readiness message has appeared"""
+        server = key.data
+        try:
+            chunk = os.read(key.fd, 65536)
+        except BlockingIOError:
             return False
+        except OSError as e:
+            print(f"   Error reading from {server.name}: {e}")
+            return False
+        
+        if not chunk:
+            # EOF: the server closed its output, but may still be running;
+            # stop reading and let its exit or the deadline decide
+            sel.unregister(key.fd)
+            return False
+        
+        # Only scan the newly read bytes; a match may straddle two reads, so back up by one needle length
+        buf = server.buf
+        buf.extend(chunk)
+        found = buf.find(server.needle, max(0, server.scanned - len(server.needle) + 1))
+        
+        # Print complete lines, up to and including the readiness line
+        if found != -1:
+            newline = buf.find(b"\n", found + len(server.needle))
+            end = newline + 1 if newline != -1 else len(buf)
+        else:
+            end = buf.rfind(b"\n") + 1
+        if end:
+            # Decode once per printed slice; bad bytes must not abort startup
+            for line_str in buf[:end].decode('utf-8', errors='replace').splitlines():
+                print(f"   {server.name}: {line_str}")
+        del buf[:end]
+        server.scanned = len(buf)
+        
+        if found == -1:
+            return False
+        print(f"✅ {server.name} is ready!")
+        # Stop reading its output but keep watching for an early exit
+        sel.unregister(key.fd)
+        return True
+
+    @staticmethod
+    def _report_exit(server: _Server):
+        """Reap a server that exited during startup and report it"""
+        server.process.wait()  # Already exited, so this only reaps it
+        print(f"❌ {server.name} process terminated unexpectedly")
 
     def run_client(self) -> bool:
         """Run the client for latency testing"""
         print("🚀 Running client for latency testing...")
         try:
-            cmd = ["just", "client", "https://localhost:3002", "https://localhost:3004"]
+            cmd = [self._just, "client", "https://localhost:3002", "https://localhost:3004"]
             client_process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                universal_newlines=True
+                universal_newlines=False,
+                bufsize=0
             )
             
             print("📊 Client output:")
             print("-" * 50)
+            sys.stdout.flush()  # Keep our header ahead of the raw client bytes
             
-            # Stream client output in real-time
+            # Stream client output in real-time, passing raw chunks straight through
             if client_process.stdout is not None:
-                for line in client_process.stdout:
-                    print(line.rstrip())
+                fd = client_process.stdout.fileno()
+                os.set_blocking(fd, True)
+                chunk = b""
+                while True:
+                    last_chunk, chunk = chunk, os.read(fd, 65536)
+                    if not chunk:
+                        break
+                    sys.stdout.buffer.write(chunk)
+                    sys.stdout.buffer.flush()
+                if last_chunk and not last_chunk.endswith(b"\n"):
+                    print()  # Terminate a final unterminated line
             
             client_process.wait()
             
@@ -292,11 +422,7 @@ class MycoRunner:
         
         # Check if ports are actually free now
         if not self.check_ports_free():
-            print("❌ Ports are still in use after cleanup. Trying more aggressive cleanup...")
-            # Try a more aggressive cleanup
-            subprocess.run(["pkill", "-9", "-f", "rpc_server"], capture_output=True, check=False)
-            subprocess.run(["pkill", "-9", "-f", "cargo.*rpc_server"], capture_output=True, check=False)
-            time.sleep(1)
+            print("❌ Ports are still in use after cleanup. Retrying cleanup...")
             self.cleanup_ports()
             
             if not self.check_ports_free():
@@ -304,14 +430,23 @@ class MycoRunner:
                 return False
         
         try:
-            # Step 1: Start Server2
-            if not self.start_server2():
-                print("❌ Failed to start Server2. Exiting.")
-                return False
-            
-            # Step 2: Start Server1
-            if not self.start_server1():
-                print("❌ Failed to start Server1. Exiting.")
+            # Steps 1 and 2: Start Server2, then Server1 as soon as Server2 is
+            # listening (Server1 connects to Server2 during startup)
+            if not self.start_servers([
+                (
+                    "Server2",
+                    [self._just, "server2"],
+                    "Server2 listening on",
+                    30,
+                ),
+                (
+                    "Server1",
+                    [self._just, "server1"],
+                    "Server1 listening on",
+                    60,  # Server1 needs more time to establish connections
+                ),
+            ]):
+                print("❌ Failed to start servers. Exiting.")
                 return False
             
             # Step 3: Run client
@@ -330,20 +465,24 @@ class MycoRunner:
 
 def main():
     """Entry point"""
+    # Process discovery and cleanup read /proc, which only Linux provides
+    if not sys.platform.startswith("linux"):
+        print("❌ Error: run_myco.py requires Linux. On other platforms, use run_myco.sh.")
+        sys.exit(1)
+    
     # Check if we're in the right directory
     if not os.path.exists("justfile"):
         print("❌ Error: justfile not found. Please run this script from the MYCO directory.")
         sys.exit(1)
     
     # Check if just command is available
-    try:
-        subprocess.run(["just", "--version"], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    just = shutil.which("just")
+    if just is None:
         print("❌ Error: 'just' command not found. Please install just first.")
         print("   Installation: brew install just")
         sys.exit(1)
     
-    runner = MycoRunner()
+    runner = MycoRunner(just)
     success = runner.run()
     
     if success: